@@ -0,0 +1,382 @@
+'''
+This script cleans the annotation columns of the run level metadata so that
+the controlled vocabulary columns (CELL_LINE, INHIBITOR, LIBRARYTYPE etc.)
+hold consistent values prior to fixture generation
+
+It applies the manually curated values from RiboCrypt where available and
+then standardizes the free text columns
+
+Usage:
+    python clean_metadata.py -i <metadata csv> -r <ribocrypt csv> -o <output csv>
+'''
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# one alternation per vocabulary so each column is scanned once, with the
+# named group giving the canonical label for whichever token matched; kept as
+# pattern strings with an inline (?i) flag because arrow-backed str.extract
+# accepts only strings, not compiled patterns
+CELL_TYPE_PATTERN = (
+    r"(?i)(?P<Fibroblast>fibroblast)|(?P<Neuroblast>neuroblast)|"
+    r"(?P<Lymphoblast>lymphoblast)|(?P<Myoblast>myoblast)|"
+    r"(?P<Osteoblast>osteoblast)|(?P<Keratinocyte>keratinocyte)|"
+    r"(?P<Melanocyte>melanocyte)|(?P<Hepatocyte>hepatocyte)"
+)
+
+LIBRARY_TYPE_PATTERN = (
+    r"(?i)(?P<RFP>ribosome profiling|ribo-seq)|(?P<RNA>rna-seq)|"
+    r"(?P<SSU>40s|small ribosomal subunit)|(?P<LSU>60s|80s)|"
+    r"(?P<TI>initiation)"
+)
+
+# canonical organism names; every entry is a two-word binomial, so a name is
+# resolved by looking up its first two words rather than scanning prefixes
+ORGANISMS = (
+    "Homo sapiens", "Mus musculus", "Rattus norvegicus",
+    "Saccharomyces cerevisiae", "Schizosaccharomyces pombe",
+    "Drosophila melanogaster", "Caenorhabditis elegans", "Danio rerio",
+    "Arabidopsis thaliana", "Escherichia coli", "Bacillus subtilis",
+    "Zea mays", "Oryza sativa", "Triticum aestivum", "Gallus gallus",
+    "Xenopus laevis", "Candida albicans", "Plasmodium falciparum",
+    "Trypanosoma brucei", "Toxoplasma gondii",
+    "Chlamydomonas reinhardtii", "Neurospora crassa",
+    "Aspergillus nidulans", "Staphylococcus aureus",
+    "Pseudomonas aeruginosa", "Salmonella enterica",
+    "Mycobacterium tuberculosis",
+)
+ORGANISM_PREFIX_MAP = {organism: organism for organism in ORGANISMS}
+
+# bookkeeping columns that should not be carried into the cleaned metadata set
+UNWANTED_COLUMNS = frozenset([
+    "Unnamed: 0", "Unnamed: 0.1", "index", "level_0", "KIT", "INFO",
+    "CHECKED", "UNKNOWN",
+])
+
+# entries in CELL_LINE that describe a tissue or sample source rather than a
+# cell line, already lowercased for the hashtable isin lookup
+NON_CELL_LINES = frozenset([
+    "tissue", "primary", "liver", "brain", "kidney", "heart", "muscle",
+    "blood", "tumor", "whole organism", "embryo", "seedling", "leaf",
+    "none", "nan", "unknown", "n/a", "not applicable", "not collected",
+])
+
+
+def update_from_ribocrypt(df: pd.DataFrame, ribocrypt_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Update annotation columns with the manually curated values from RiboCrypt
+    where a run has been curated and the curated value is informative
+
+    Inputs:
+        df: pandas dataframe
+        ribocrypt_df: pandas dataframe with curated values per Run
+
+    Returns:
+        df: pandas dataframe
+    '''
+    update_columns = ["CELL_LINE", "TISSUE", "INHIBITOR", "AUTHOR"]
+
+    # align the curated values to the sample rows by reindexing on Run
+    # instead of materializing a merged frame with suffixed column copies
+    curated = ribocrypt_df.drop_duplicates("Run").set_index("Run")
+    aligned = curated.reindex(df["Run"])
+    aligned.index = df.index
+
+    for col in update_columns:
+        new = aligned[col]
+        # keep the masks as pandas comparisons so uncurated runs stay NA
+        # through the logic and fill to False, rather than raising; a curated
+        # value over a missing original still counts as a change
+        valid = (new.notna() & new.ne("NONE") & new.ne("nan")
+                 & (new.ne(df[col]) | df[col].isna())).fillna(False).to_numpy(dtype=bool)
+        df.loc[valid, col] = new.to_numpy()[valid]
+        print(f"{col}: {int(valid.sum())} values updated from RiboCrypt")
+
+    # curated CONDITION only records wild type vs not, map it onto the
+    # Control/Test vocabulary used in the portal
+    cond_y = aligned["CONDITION"]
+    cond_valid = (cond_y.notna() & cond_y.ne("NONE")
+                  & cond_y.ne("nan")).fillna(False).to_numpy(dtype=bool)
+    new_cond = np.where(cond_y.eq("WT").fillna(False).to_numpy(dtype=bool), "Control", "Test")
+    df.loc[cond_valid, "CONDITION"] = new_cond[cond_valid]
+    print(f"CONDITION: {int(cond_valid.sum())} values updated from RiboCrypt")
+
+    return df
+
+
+def unique_values_series(series: pd.Series) -> pd.Series:
+    '''
+    Return the unique values of a column as a Series indexed by themselves,
+    so a cleaning mapping can be computed once per unique value and then
+    broadcast back over the rows with map
+
+    Inputs:
+        series: pandas series
+
+    Returns:
+        uniques: pandas series of unique values indexed by themselves
+    '''
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        uniques = series.cat.categories
+    else:
+        uniques = pd.Index(series.dropna().unique())
+    return pd.Series(uniques, index=uniques)
+
+
+def clean_cell_lines(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Standardize the CELL_LINE column, removing entries that describe a tissue
+    or sample source rather than a cell line and collapsing cell type
+    descriptions to their canonical names
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    cleaned = unique_values_series(df["CELL_LINE"])
+    cleaned[cleaned.str.lower().isin(NON_CELL_LINES)] = np.nan
+
+    extracted = cleaned.str.extract(CELL_TYPE_PATTERN)
+    # arrow-backed extract fills the non-matching groups of a matching row
+    # with empty strings rather than NA, so both must count as no-match
+    masks = [(extracted[cell_type].notna() & extracted[cell_type].ne(""))
+             .fillna(False).to_numpy(dtype=bool) for cell_type in extracted.columns]
+    cleaned = pd.Series(np.select(masks, extracted.columns, default=cleaned),
+                        index=cleaned.index)
+
+    df["CELL_LINE"] = df["CELL_LINE"].map(cleaned).astype("category")
+    return df
+
+
+def clean_inhibitors(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Standardize the INHIBITOR column, collapsing untreated synonyms and
+    removing entries that are not an inhibitor name
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    untreated_terms = ["none", "untreated", "no treatment", "dmso", "water", "mock"]
+    accepted_inhibitors = [
+        "chx", "cycloheximide", "harringtonine", "lactimidomycin",
+        "puromycin", "anisomycin", "emetine",
+    ]
+
+    lowered = unique_values_series(df["INHIBITOR"]).str.lower()
+
+    # one np.select pass; entries like "chx 5 min" record a timepoint rather
+    # than an inhibitor, so they drop out before the valid-name check
+    conditions = [
+        lowered.isin(untreated_terms),
+        lowered.str.contains("thapsigargin", na=False, regex=False),
+        lowered.str.endswith("min", na=False),
+        lowered.isin(accepted_inhibitors) | lowered.str.endswith("in", na=False),
+    ]
+    choices = ["untreated", "thapsigargin", np.nan, lowered]
+    cleaned = pd.Series(np.select(conditions, choices, default=np.nan),
+                        index=lowered.index)
+
+    df["INHIBITOR"] = df["INHIBITOR"].map(cleaned).astype("category")
+    return df
+
+
+def clean_library_types(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Standardize the LIBRARYTYPE column to the portal vocabulary
+    (RFP, RNA, SSU, LSU, TI)
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    cleaned = unique_values_series(df["LIBRARYTYPE"])
+
+    extracted = cleaned.str.extract(LIBRARY_TYPE_PATTERN)
+    # arrow-backed extract fills the non-matching groups of a matching row
+    # with empty strings rather than NA, so both must count as no-match
+    masks = [(extracted[lib_type].notna() & extracted[lib_type].ne(""))
+             .fillna(False).to_numpy(dtype=bool) for lib_type in extracted.columns]
+    cleaned = pd.Series(np.select(masks, extracted.columns, default=cleaned),
+                        index=cleaned.index)
+
+    df["LIBRARYTYPE"] = df["LIBRARYTYPE"].map(cleaned).astype("category")
+    return df
+
+
+def _canonical_scientific_name(name: str) -> str:
+    '''
+    Resolve one scientific name to its canonical organism name
+
+    Inputs:
+        name: string
+
+    Returns:
+        canonical name: string
+    '''
+    head = " ".join(name.split(" ", 2)[:2])
+    if head in ORGANISM_PREFIX_MAP:
+        return ORGANISM_PREFIX_MAP[head]
+    if name.startswith("Severe acute respiratory"):
+        return "SARS-CoV2"
+    return name
+
+
+def clean_scientific_names(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Collapse strain level scientific names to the organism name so that all
+    runs from the same organism share one ScientificName value
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    cleaned = unique_values_series(df["ScientificName"]).map(_canonical_scientific_name)
+    df["ScientificName"] = df["ScientificName"].map(cleaned).astype("category")
+    return df
+
+
+def update_standardized_columns(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Copy values from the per source annotation columns into the standardized
+    uppercase columns where the source column has a value
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    column_pairs = [
+        ("LIBRARYTYPE", "LibraryType"),
+        ("REPLICATE", "Replicate"),
+        ("CONDITION", "Condition"),
+        ("INHIBITOR", "Inhibitor"),
+        ("TIMEPOINT", "Timepoint"),
+        ("TISSUE", "Tissue"),
+        ("CELL_LINE", "Cell_Line"),
+        ("FRACTION", "Fraction"),
+        ("AUTHOR", "Author"),
+    ]
+    for main_col, source_col in column_pairs:
+        if source_col not in df.columns:
+            continue
+        df[main_col] = df[source_col].combine_first(df[main_col])
+
+    df = df.drop(columns=[source_col for _, source_col in column_pairs if source_col in df.columns])
+    return df
+
+
+def drop_unwanted_columns(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Drop bookkeeping columns that should not be carried into the cleaned
+    metadata set
+
+    Inputs:
+        df: pandas dataframe
+
+    Returns:
+        df: pandas dataframe
+    '''
+    drop_list = [col for col in df.columns if col in UNWANTED_COLUMNS or "Experimental" in col]
+    df = df.drop(columns=drop_list)
+
+    return df
+
+
+def pipeline(df: pd.DataFrame, ribocrypt_df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
+    '''
+    Apply the full cleaning sequence to a batch of rows
+
+    Inputs:
+        df: pandas dataframe
+        ribocrypt_df: pandas dataframe of curated values, or None
+        debug: bool, print the spot-check run after each stage
+
+    Returns:
+        df: pandas dataframe
+    '''
+    # a column that is entirely empty in this chunk parses as arrow null
+    # type, which can neither take string assignments from the curated
+    # update nor become categories; normalize those to arrow strings first
+    for col in ["CELL_LINE", "INHIBITOR", "LIBRARYTYPE", "ScientificName",
+                "TISSUE", "CONDITION", "AUTHOR"]:
+        if col in df.columns and str(df[col].dtype) == "null[pyarrow]":
+            df[col] = df[col].astype("string[pyarrow]")
+
+    # locate the spot-check run once; each stage below prints it with an O(1)
+    # label lookup instead of rescanning the whole frame
+    debug_idx = df.index[df["Run"] == "SRR2535268"] if debug else None
+    debug = debug and len(debug_idx) > 0
+    if debug:
+        print(df.loc[debug_idx, ["CELL_LINE", "TISSUE", "INHIBITOR", "CONDITION"]])
+
+    if ribocrypt_df is not None:
+        df = update_from_ribocrypt(df, ribocrypt_df)
+        if debug:
+            print(df.loc[debug_idx, ["CELL_LINE", "TISSUE", "INHIBITOR", "CONDITION"]])
+
+    # categorical storage keeps one copy of each unique string and lets the
+    # cleaners work on the small categories index instead of every row; done
+    # after the curated updates so new curated values need no category bookkeeping
+    for col in ["CELL_LINE", "INHIBITOR", "LIBRARYTYPE", "ScientificName", "TISSUE", "CONDITION"]:
+        df[col] = df[col].astype("category")
+
+    df = clean_cell_lines(df)
+    if debug:
+        print(df.loc[debug_idx, ["CELL_LINE", "TISSUE"]])
+
+    df = clean_inhibitors(df)
+    if debug:
+        print(df.loc[debug_idx, ["INHIBITOR"]])
+
+    df = clean_library_types(df)
+    if debug:
+        print(df.loc[debug_idx, ["LIBRARYTYPE"]])
+
+    df = clean_scientific_names(df)
+    if debug:
+        print(df.loc[debug_idx, ["ScientificName"]])
+
+    df = update_standardized_columns(df)
+    df = drop_unwanted_columns(df)
+
+    return df
+
+
+def main(args):
+    ribocrypt_df = None
+    if args.ribocrypt:
+        ribocrypt_df = pd.read_csv(args.ribocrypt, engine="pyarrow", dtype_backend="pyarrow",
+                                   usecols=["Run", "CELL_LINE", "TISSUE", "INHIBITOR", "CONDITION", "AUTHOR"])
+
+    # every stage is row local, so the metadata streams through in bounded
+    # chunks; the pyarrow engine cannot iterate, so the chunked reader uses
+    # the C parser but keeps arrow-backed columns
+    reader = pd.read_csv(args.input_file, chunksize=500_000, dtype_backend="pyarrow")
+    with open(args.output_file, "w", newline="") as out:
+        for i, chunk in enumerate(reader):
+            chunk = pipeline(chunk, ribocrypt_df, debug=args.debug)
+            chunk.to_csv(out, index=False, header=(i == 0), chunksize=100_000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the run level metadata annotation columns")
+    parser.add_argument("-i", "--input_file", help="Input metadata csv file", required=True)
+    parser.add_argument("-r", "--ribocrypt", help="RiboCrypt curated csv file", required=False)
+    parser.add_argument("-o", "--output_file", help="Output csv file", required=True)
+    parser.add_argument("-d", "--debug", help="Print the spot-check run after each stage", action="store_true")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,473 @@
+"""
+Script to compare two versions of the sample metadata csv and report their differences
+
+Used to check what changed between metadata releases before fixtures are regenerated
+with generate_fixtures.py. Reports columns present in only one file, columns whose
+content is identical, and per sample (Run) mismatches for the key metadata columns
+
+Usage:
+    python csv_diff_analyzer.py <csv1> <csv2> -o <report_file>
+    python csv_diff_analyzer.py <csv1> <csv2> --interactive
+
+Example:
+python scripts/csv_diff_analyzer.py data/metadata_old.csv data/metadata_new.csv -o data/metadata_diff_report.txt
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from numba import njit, prange
+
+
+KEY_COLUMNS = ["BioProject", "ScientificName", "LIBRARYTYPE", "INHIBITOR",
+               "CELL_LINE", "TISSUE", "CONDITION", "TIMEPOINT", "FRACTION"]
+
+
+@njit(parallel=True, cache=True)
+def _mismatch_kernel(codes1: np.ndarray, codes2: np.ndarray) -> np.ndarray:
+    """
+    Elementwise mismatch between two aligned int32 code arrays, where -1 marks
+    NaN and two NaNs count as equal
+
+    Inputs:
+        codes1: int32 numpy array
+        codes2: int32 numpy array
+
+    Returns:
+        boolean numpy array, True where the sides disagree
+    """
+    out = np.empty(codes1.shape[0], dtype=np.bool_)
+    for i in prange(codes1.shape[0]):
+        out[i] = codes1[i] != codes2[i] and not (codes1[i] == -1 and codes2[i] == -1)
+    return out
+
+
+class CSVDiffAnalyzer:
+    """
+    Compare two metadata csv files that share the Run column as a primary key
+    """
+
+    def __init__(self, csv1_path: str, csv2_path: str, usecols: list = None):
+        """
+        Read both csv files with the multithreaded pyarrow parser. Columns are kept
+        as arrow-backed dtypes so string heavy metadata columns stay compact. Run is
+        forced to string so it has a stable type for merging
+
+        Inputs:
+            csv1_path: string
+            csv2_path: string
+            usecols: list of column names to load (optional, defaults to all);
+                     parse time and memory scale with the columns kept
+        """
+        self.csv1_path = csv1_path
+        self.csv2_path = csv2_path
+        # full headers are kept separately so column presence reflects the
+        # files themselves rather than whatever projection was loaded
+        self._header1 = self._csv_header(csv1_path)
+        self._header2 = self._csv_header(csv2_path)
+        read_options = pacsv.ReadOptions(use_threads=True)
+        self.df1 = pacsv.read_csv(
+            csv1_path, read_options=read_options,
+            convert_options=self._convert_options(usecols, self._header1),
+            ).to_pandas(types_mapper=pd.ArrowDtype)
+        self.df2 = pacsv.read_csv(
+            csv2_path, read_options=read_options,
+            convert_options=self._convert_options(usecols, self._header2),
+            ).to_pandas(types_mapper=pd.ArrowDtype)
+        # Run is the primary key: index and sort both frames by it once, so
+        # every later comparison is index-aligned and needs no merge at all
+        self.df1 = self.df1.set_index("Run").sort_index()
+        self.df2 = self.df2.set_index("Run").sort_index()
+        self._common_runs = self.df1.index.intersection(self.df2.index)
+        # common columns that were actually loaded; the content comparisons
+        # below work on these, presence reporting on the full headers
+        self._common_cols = self.df1.columns.intersection(self.df2.columns).sort_values().tolist()
+        self._codes1 = None
+        self._codes2 = None
+        self._aligned1 = None
+        self._aligned2 = None
+        self._mismatch_cache = {}
+        self._nan_mask_cache = {}
+
+    @staticmethod
+    def _csv_header(csv_path: str) -> list:
+        """
+        Column names of the csv, taken from the parsed header row
+
+        Inputs:
+            csv_path: string
+
+        Returns:
+            list of column names
+        """
+        with pacsv.open_csv(csv_path) as reader:
+            return reader.schema.names
+
+    @staticmethod
+    def _convert_options(usecols: list, header: list) -> pacsv.ConvertOptions:
+        """
+        Conversion options for one file: requested columns are intersected
+        with the file's own header, so a column missing from one release does
+        not abort the parse. strings_can_be_null matches the pandas parser:
+        empty cells in string columns load as null rather than "", keeping
+        the NaN counts honest
+
+        Inputs:
+            usecols: list of requested column names, or None for all
+            header: list of the file's column names
+
+        Returns:
+            pyarrow csv ConvertOptions
+        """
+        include = [c for c in usecols if c in header] if usecols is not None else None
+        return pacsv.ConvertOptions(column_types={"Run": pa.string()},
+                                    strings_can_be_null=True,
+                                    include_columns=include)
+
+    def _nan_masks(self, column: str) -> tuple:
+        """
+        NaN masks for the column in each file, computed once and memoized
+
+        Inputs:
+            column: string
+
+        Returns:
+            tuple of two boolean numpy arrays (first file, second file)
+        """
+        if column not in self._nan_mask_cache:
+            self._nan_mask_cache[column] = (self.df1[column].isna().to_numpy(),
+                                            self.df2[column].isna().to_numpy())
+        return self._nan_mask_cache[column]
+
+    def _encode_common(self):
+        """
+        Align both frames on their shared runs and factorize every common
+        column once onto a shared dictionary, leaving int32 code arrays that
+        all comparison methods reuse instead of re-comparing Python strings
+        """
+        if self._codes1 is not None:
+            return
+        common = self._common_cols
+        self._aligned1 = self.df1.loc[self._common_runs, common]
+        self._aligned2 = self.df2.loc[self._common_runs, common]
+        self._codes1 = {}
+        self._codes2 = {}
+        n_runs = len(self._common_runs)
+        for col in common:
+            combined = pd.Categorical(pd.concat(
+                [self._aligned1[col], self._aligned2[col]], ignore_index=True))
+            codes = combined.codes.astype(np.int32)
+            self._codes1[col] = codes[:n_runs]
+            self._codes2[col] = codes[n_runs:]
+
+    @staticmethod
+    def stream_column_stats(csv_path: str) -> dict:
+        """
+        Build per column aggregates in a single streaming pass over the csv
+
+        Iterates the file as record batches and accumulates NaN counts and value
+        counts incrementally, so peak memory stays at one batch rather than the
+        whole file
+
+        Inputs:
+            csv_path: string
+
+        Returns:
+            dictionary mapping column name to its nan_count and value_counts
+        """
+        stats = {}
+        convert_options = pacsv.ConvertOptions(strings_can_be_null=True)
+        with pacsv.open_csv(csv_path, convert_options=convert_options) as reader:
+            for batch in reader:
+                for name, col in zip(batch.schema.names, batch.columns):
+                    col_stats = stats.setdefault(name, {"nan_count": 0, "value_counts": Counter()})
+                    col_stats["nan_count"] += col.null_count
+                    for entry in pc.value_counts(col).to_pylist():
+                        col_stats["value_counts"][entry["values"]] += entry["counts"]
+        return stats
+
+    @cached_property
+    def column_presence(self) -> dict:
+        """
+        Which columns are present in each file, computed once per session from
+        the full csv headers rather than the loaded projection
+
+        Returns:
+            dictionary with unique_to_first, unique_to_second and common column lists
+        """
+        cols1 = pd.Index(self._header1)
+        cols2 = pd.Index(self._header2)
+        return {
+            "unique_to_first": cols1.difference(cols2).sort_values().tolist(),
+            "unique_to_second": cols2.difference(cols1).sort_values().tolist(),
+            "common": cols1.intersection(cols2).sort_values().tolist(),
+        }
+
+    @cached_property
+    def identical_columns(self) -> dict:
+        """
+        Which of the common columns have identical content in both files,
+        computed once per session
+
+        Returns:
+            dictionary with identical and different column lists
+        """
+        common_cols = self._common_cols
+        if len(self.df1) != len(self.df2):
+            return {"identical": [], "different": common_cols}
+
+        if len(self._common_runs) != len(self.df1):
+            return {"identical": [], "different": common_cols}
+
+        self._encode_common()
+        differs = {}
+        for col in self._codes1:
+            # a column whose dtype disagrees between the files cannot compare
+            # equal, so skip the elementwise scan for it entirely
+            if self.df1[col].dtype != self.df2[col].dtype:
+                differs[col] = True
+                continue
+            # cheap digest first: identical columns must agree on NaN count and
+            # on the sum of their row hashes, so only digest-matching
+            # candidates get the elementwise scan
+            nan1, nan2 = self._nan_masks(col)
+            digest1 = (int(nan1.sum()),
+                       int(pd.util.hash_pandas_object(self.df1[col], index=False).sum()))
+            digest2 = (int(nan2.sum()),
+                       int(pd.util.hash_pandas_object(self.df2[col], index=False).sum()))
+            if digest1 != digest2:
+                differs[col] = True
+            else:
+                differs[col] = bool(_mismatch_kernel(self._codes1[col], self._codes2[col]).any())
+        return {
+            "identical": [c for c in common_cols if not differs[c]],
+            "different": [c for c in common_cols if differs[c]],
+        }
+
+    def find_mismatched_values(self, column: str, output_handle=None) -> pd.DataFrame:
+        """
+        Find runs where the given column differs between the two files
+
+        Inputs:
+            column: string
+            output_handle: open file handle (optional, mismatch table is written to it)
+
+        Returns:
+            dataframe with Run, <column>_1 and <column>_2 for mismatched runs
+        """
+        if column not in self._mismatch_cache:
+            self._encode_common()
+            # DataFrame.compare returns only the changed cells (NaN == NaN) in
+            # one optimized call, with the aligned Run index carried along; a
+            # fully identical column comes back with no columns at all, so
+            # build the empty result explicitly rather than relabelling it
+            diffs = self._aligned1[[column]].compare(self._aligned2[[column]], align_axis=1)
+            if diffs.columns.empty:
+                diffs = pd.DataFrame(columns=[f"{column}_1", f"{column}_2"],
+                                     index=pd.Index([], name=self._aligned1.index.name))
+            else:
+                diffs.columns = [f"{column}_1", f"{column}_2"]
+            self._mismatch_cache[column] = diffs.reset_index()
+        mismatches = self._mismatch_cache[column]
+
+        if output_handle:
+            output_handle.write(f"\n## Mismatched values for {column} ({len(mismatches)} runs)\n")
+            output_handle.write(f"{'Run':<15} | {'first':<30} | {'second':<30}\n")
+            if len(mismatches):
+                # pad and join the columns as whole arrays rather than pushing
+                # each row through the Python format machinery
+                runs = np.char.ljust(mismatches["Run"].to_numpy(dtype=str), 15)
+                first = np.char.ljust(mismatches[f"{column}_1"].to_numpy(dtype=str), 30)
+                second = np.char.ljust(mismatches[f"{column}_2"].to_numpy(dtype=str), 30)
+                lines = np.char.add(np.char.add(np.char.add(np.char.add(
+                    runs, " | "), first), " | "), second)
+                output_handle.write("\n".join(lines.tolist()) + "\n")
+
+        return mismatches
+
+    @cached_property
+    def identical_rows(self) -> dict:
+        """
+        Runs whose values are identical across all common columns, computed
+        once per session
+
+        Returns:
+            dictionary with identical_runs and different_runs lists
+        """
+        self._encode_common()
+        # one xxhash-combined row hash per side, then a single O(rows) compare
+        # instead of a rows x columns equality scan
+        hashes1 = pd.util.hash_pandas_object(self._aligned1, index=False).to_numpy()
+        hashes2 = pd.util.hash_pandas_object(self._aligned2, index=False).to_numpy()
+        row_identical = hashes1 == hashes2
+
+        return {
+            "identical_runs": self._common_runs[row_identical].tolist(),
+            "different_runs": self._common_runs[~row_identical].tolist(),
+        }
+
+    def analyze_value_distributions(self, column: str) -> dict:
+        """
+        Get the ten most common values for the column in each file
+
+        Inputs:
+            column: string
+
+        Returns:
+            dictionary with the top value counts for each file
+        """
+        return {
+            "first": self._top_values(self.df1[column]),
+            "second": self._top_values(self.df2[column]),
+        }
+
+    @staticmethod
+    def _top_values(series: pd.Series, n: int = 10) -> dict:
+        """
+        Top n value counts for a series. Arrow backed columns go through the
+        pyarrow value_counts kernel, which handles dictionary arrays in C++;
+        anything else falls back to pandas
+
+        Inputs:
+            series: pandas series
+            n: int
+
+        Returns:
+            dictionary mapping value to count
+        """
+        if isinstance(series.dtype, pd.ArrowDtype):
+            counts = pc.value_counts(series.array._pa_array).to_pylist()
+            counts.sort(key=lambda entry: entry["counts"], reverse=True)
+            return {entry["values"]: entry["counts"]
+                    for entry in counts[:n] if entry["values"] is not None}
+        return series.value_counts().head(n).to_dict()
+
+    def generate_difference_report(self, output_file: str):
+        """
+        Write a full difference report to the output file
+
+        Inputs:
+            output_file: string
+        """
+        presence = self.column_presence
+        content = self.identical_columns
+
+        with open(output_file, "w") as f:
+            f.write("# Metadata difference report\n")
+            f.write(f"\n## Columns only in first file ({len(presence['unique_to_first'])})\n")
+            for col in presence["unique_to_first"]:
+                f.write(f"{col}\n")
+            f.write(f"\n## Columns only in second file ({len(presence['unique_to_second'])})\n")
+            for col in presence["unique_to_second"]:
+                f.write(f"{col}\n")
+            f.write(f"\n## Identical common columns ({len(content['identical'])})\n")
+            for col in content["identical"]:
+                f.write(f"{col}\n")
+            f.write(f"\n## Differing common columns ({len(content['different'])})\n")
+            for col in content["different"]:
+                f.write(f"{col}\n")
+            stats1 = self.stream_column_stats(self.csv1_path)
+            stats2 = self.stream_column_stats(self.csv2_path)
+            f.write("\n## NaN counts (first vs second)\n")
+            for col in presence["common"]:
+                f.write(f"{col}: {stats1[col]['nan_count']} vs {stats2[col]['nan_count']}\n")
+
+            key_cols = [c for c in KEY_COLUMNS if c in self._common_cols]
+            self._encode_common()
+
+            # the per-column compares are independent and mostly native
+            # pandas work, so compute them concurrently and write in a
+            # fixed order through the one open handle
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                list(pool.map(self.find_mismatched_values, key_cols))
+            for column in key_cols:
+                self.find_mismatched_values(column, output_handle=f)
+
+    def interactive_analysis(self):
+        """
+        Run an interactive session for exploring the differences between the files
+        """
+        while True:
+            print("\n1. Compare column presence")
+            print("2. Compare column content")
+            print("3. Find mismatched values for a column")
+            print("4. Value distribution for a column")
+            print("5. NaN counts for a column")
+            print("6. Find identical rows")
+            print("q. Quit")
+            choice = input("Option: ").strip()
+
+            if choice == "1":
+                results = self.column_presence
+                print(f"Only in first: {results['unique_to_first']}")
+                print(f"Only in second: {results['unique_to_second']}")
+                print(f"Common columns: {len(results['common'])}")
+
+            elif choice == "2":
+                results = self.identical_columns
+                print(f"Identical columns: {results['identical']}")
+                print(f"Differing columns: {results['different']}")
+
+            elif choice == "3":
+                column = input("Column: ").strip()
+                mismatches = self.find_mismatched_values(column)
+                print(mismatches)
+
+            elif choice == "4":
+                column = input("Column: ").strip()
+                results = self.analyze_value_distributions(column)
+                print(f"First: {results['first']}")
+                print(f"Second: {results['second']}")
+
+            elif choice == "5":
+                column = input("Column: ").strip()
+                mask1, mask2 = self._nan_masks(column)
+                print(f"First: {mask1.sum()}")
+                print(f"Second: {mask2.sum()}")
+
+            elif choice == "6":
+                results = self.identical_rows
+                # a single buffered write instead of one print per run
+                sys.stdout.write(f"Identical runs ({len(results['identical_runs'])}):\n")
+                sys.stdout.write("\n".join(map(str, results["identical_runs"])) + "\n")
+                sys.stdout.write(f"Different runs ({len(results['different_runs'])}):\n")
+                sys.stdout.write("\n".join(map(str, results["different_runs"])) + "\n")
+
+            elif choice == "q":
+                break
+
+
+def main(args):
+    if args.cols:
+        usecols = args.cols.split(",")
+    elif args.interactive:
+        usecols = None
+    else:
+        # the report only ever touches the key columns, so skip parsing the rest
+        usecols = ["Run"] + KEY_COLUMNS
+    analyzer = CSVDiffAnalyzer(args.csv1, args.csv2, usecols=usecols)
+    if args.interactive:
+        analyzer.interactive_analysis()
+    else:
+        analyzer.generate_difference_report(args.output)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two metadata csv files")
+    parser.add_argument("csv1", help="First (older) csv file")
+    parser.add_argument("csv2", help="Second (newer) csv file")
+    parser.add_argument("-o", "--output", help="Output report file", default="metadata_diff_report.txt")
+    parser.add_argument("--interactive", help="Explore differences interactively", action="store_true")
+    parser.add_argument("--cols", help="Comma separated list of columns to load", required=False)
+    args = parser.parse_args()
+
+    main(args)
@@ -8,11 +8,12 @@ CSV columns must match the model fields
 '''
 
 import argparse
+import json
 import pandas as pd
 
-def df_to_sample_fixture(df: pd.DataFrame, last_pk: int, model: str) -> str:
+def df_to_sample_fixture(df: pd.DataFrame, last_pk: int, model: str) -> list:
     """
-    Convert cleaned df to fixture string 
+    Convert cleaned df to a list of fixture records
     
     Inputs:
         df: pandas dataframe
@@ -20,39 +21,30 @@ def df_to_sample_fixture(df: pd.DataFrame, last_pk: int, model: str) -> str:
         model: string
     
     Returns:
-        fixture string
+        list of fixture record dictionaries
     """
-    fixture = []
+    records = []
 
-    for i, row in df.iterrows():
+    columns = list(df.columns)
+    for row in df.itertuples(index=False, name=None):
         if not last_pk:
             last_pk = 1
         else:
             last_pk += 1
-        fixture.append("{\n")
-        fixture.append(f'    "model": "main.{model}",\n')
-        fixture.append(f'    "pk": {last_pk},\n')
-        fixture.append('    "fields": {\n')
-        for col in df.columns:
-            if type(row[col]) == str:
-                # entry = row[col].replace('""""', "'").replace('\n', ' ').replace('"', "'")
-                fixture.append(f'        "{col}": "{row[col]}",\n')
-            else: 
-                fixture.append(f'        "{col}": "{row[col]}",\n')
+        records.append({
+            "model": f"main.{model}",
+            "pk": last_pk,
+            "fields": {col: str(value) for col, value in zip(columns, row)},
+        })
 
-        fixture[-1] = fixture[-1][:-2]  # removes trailing comma
-        fixture.append("    }\n")
-        fixture.append("},\n")
-
-    fixture = " ".join(fixture)
-    return fixture
+    return records
 
 
 def main(args):
     df = pd.read_csv(args.input)
-    fixture = df_to_sample_fixture(df, 0, args.model)
+    records = df_to_sample_fixture(df, 0, args.model)
     with open(args.output, "w") as f:
-        f.write(fixture)
+        f.write(json.dumps(records, indent=4, ensure_ascii=False))
 
 
 if __name__ == "__main__":
@@ -21,8 +21,35 @@ python scripts/generate_fixtures.py
 """
 from populate_study_metainfo_dict import get_metainformation_dict
 import argparse
+import json
 import pandas as pd
 import sqlite3
+from itertools import chain
+
+
+NUMERIC_COLUMNS = frozenset({"spots", "bases", "avgLength", "size_MB"})
+
+_CONN = None
+
+
+def get_connection(db: str) -> sqlite3.Connection:
+    """
+    Get the shared connection to the portal database, created on first use
+    with pragmas tuned for this bulk workload. Reused by every lookup so the
+    database is opened once per run instead of once per query
+    
+    Inputs:
+        db: string
+    Returns:
+        sqlite3 connection
+    """
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(db)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.execute("PRAGMA cache_size=-65536")
+    return _CONN
 
 
 def get_last_pk(model: str, db: str) -> int:
@@ -35,94 +62,111 @@ def get_last_pk(model: str, db: str) -> int:
     Returns:
         last_pk: int
     """
-    conn = sqlite3.connect(db)
-    c = conn.cursor()
+    c = get_connection(db).cursor()
     c.execute(f"SELECT MAX(id) FROM {model}")
     last_pk = c.fetchone()[0]
-    conn.close()
 
     return last_pk
 
 
-def df_to_sample_fixture(df: pd.DataFrame, last_pk: int) -> str:
+def get_column_names(table: str, db: str) -> list:
+    """
+    Get the column names of the table in the database
+
+    Inputs:
+        table: string
+        db: string
+    Returns:
+        column_names: list of strings
+    """
+    c = get_connection(db).cursor()
+    c.execute(f"SELECT * FROM {table} LIMIT 1")
+    column_names = [description[0] for description in c.description]
+
+    return column_names
+
+
+def df_to_sample_fixture(df: pd.DataFrame, last_pk: int, sample_columns: set = None):
     """
-    Convert cleaned df to fixture string 
+    Convert cleaned df to fixture records, one at a time
     
     Inputs:
         df: pandas dataframe
         last_pk: int
+        sample_columns: set of field names of the sample model, looked up once
+                        by the caller (optional, all columns are kept if not given)
     
-    Returns:
-        fixture string
+    Yields:
+        fixture record dictionaries
     """
-    fixture = []
-
-    for i, row in df.iterrows():
-        if not last_pk:
-            last_pk = 1
-        else:
-            last_pk += 1
-        fixture.append("{\n")
-        fixture.append('    "model": "main.sample",\n')
-        fixture.append(f'    "pk": {last_pk},\n')
-        fixture.append('    "fields": {\n')
-        for col in df.columns:
-            if col in ["spots", "bases", "avgLength", "size_MB"]:
-                try:
-                    fixture.append(f'        "{col}": {int(row[col])},\n')
-                except:
-                    pass
+    if sample_columns is not None:
+        columns = [c for c in df.columns if c in sample_columns]
+    else:
+        columns = list(df.columns)
+    numeric_cols = [c for c in columns if c in NUMERIC_COLUMNS]
+
+    # narrow to the accepted columns and cast the numeric ones once up front,
+    # so the per-row int() conversion disappears from the hot loop
+    df = df[columns].copy()
+    for col in numeric_cols:
+        numeric = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        # resolve missingness vectorized here so the row loop only needs an
+        # identity check instead of pd.notna per cell
+        df[col] = numeric.astype(object).where(numeric.notna(), None)
+
+    # escape every string column in one vectorized pass each, so the row
+    # loop interpolates already-cleaned values instead of chaining three
+    # replace calls per cell; cast to string dtype before filling, because
+    # filling a typed column (arrow numeric, categorical) with a str raises,
+    # while the string cast keeps NA for the fill to stringify — json.dumps
+    # would otherwise emit missing values as bare NaN tokens
+    for col in columns:
+        if col not in NUMERIC_COLUMNS:
+            df[col] = (df[col].astype("string").fillna("nan")
+                       .str.replace('""""', "'", regex=False)
+                       .str.replace('\n', ' ', regex=False)
+                       .str.replace('"', "'", regex=False))
+
+    # pull each column out to a plain numpy array and walk the rows with
+    # zip/enumerate, keeping the per-row pk branch and the itertuples
+    # machinery out of the hot loop
+    arrays = [df[col].to_numpy() for col in columns]
+    start_pk = last_pk if last_pk else 0
+    for pk, row in enumerate(zip(*arrays), start_pk + 1):
+        fields = {}
+        for col, value in zip(columns, row):
+            if col in NUMERIC_COLUMNS:
+                if value is not None:
+                    fields[col] = int(value)
             else:
-                if type(row[col]) == str:
-                    entry = row[col].replace('""""', "'").replace('\n', ' ').replace('"', "'")
-                    fixture.append(f'        "{col}": "{entry}",\n')
-                else: 
-                    fixture.append(f'        "{col}": "{row[col]}",\n')
-
-        fixture[-1] = fixture[-1][:-2]  # removes trailing comma
-        fixture.append("    }\n")
-        fixture.append("},\n")
-
-    fixture = " ".join(fixture)
-    return fixture
+                fields[col] = value
+        yield {"model": "main.sample", "pk": pk, "fields": fields}
 
 
-def write_study_fixture(information_dict: dict) -> str:
+def write_study_fixture(information_dict: dict, study_columns: set = None) -> dict:
     """
-    Give the accession of the study, return the study fixture
+    Give the accession of the study, return the study fixture record
     
     inputs:
         information_dict: dictionary
-        pk: int
+        study_columns: set of field names of the study model, looked up once
+                       by the caller (optional, all fields are kept if not given)
 
     returns:
-        fixture: string
+        fixture record dictionary
     """
-    fixture = []
-
-    fixture.append("{\n")
-    fixture.append('    "model": "main.study",\n')
-    fixture.append(f'    "pk":"{information_dict["BioProject"]}",\n')
-    fixture.append('    "fields": {\n')
-
-    for field in information_dict:
-        if type(information_dict[field]) == str:
-            entry = information_dict[field].replace('\n', ' ').replace('"', "'")
-            fixture.append(f'        "{field}": "{entry}",\n')
-        else:
-            fixture.append(f'        "{field}": "{information_dict[field]}",\n')
-    fixture[-1] = fixture[-1][:-2]
-    fixture.append("    }\n")
-    fixture.append("},\n")
+    fields = {
+        field: (value.replace('\n', ' ').replace('"', "'")
+                if type(value) == str else str(value))
+        for field, value in information_dict.items()
+        if study_columns is None or field in study_columns
+    }
+    return {"model": "main.study", "pk": information_dict["BioProject"], "fields": fields}
 
-    fixture = " ".join(fixture)
 
-    return fixture
-
-
-def write_OpenColumns_fixture(column: str, bioproject: str, values: list, pk: int) -> str:
+def write_OpenColumns_fixture(column: str, bioproject: str, values: list, pk: int) -> dict:
     '''
-    Write the OpenColumns fixture string
+    Write the OpenColumns fixture record
 
     Inputs:
         column: string
@@ -131,82 +175,81 @@ def write_OpenColumns_fixture(column: str, bioproject: str, values: list, pk: in
         last_pk: int
 
     Returns:
-        fixture: string
+        fixture record dictionary
     '''
-    fixture = []
-    fixture.append("{\n")
-    fixture.append('    "model": "main.opencolumns",\n')
-    fixture.append(f'    "pk":{pk},\n')
-    fixture.append('    "fields": {\n')
-    fixture.append(f'        "column_name": "{column}",\n')
-    fixture.append(f'        "bioproject": "{bioproject}",\n')
-    fixture.append(f'        "values": "{",".join(values)}",\n')
-    fixture[-1] = fixture[-1][:-2]
-    fixture.append("    }\n")
-    fixture.append("},\n")
-
-    fixture = " ".join(fixture)
+    return {
+        "model": "main.opencolumns",
+        "pk": pk,
+        "fields": {
+            "column_name": column,
+            "bioproject": bioproject,
+            "values": ",".join(values),
+        },
+    }
 
-    return fixture
 
 
-
-def add_study_fixtures(df: pd.DataFrame, db: str, core_columns: list) -> pd.DataFrame:
+def add_study_fixtures(df: pd.DataFrame, db: str, core_columns: list):
     """
-    Add study fixtures to the dataframe
+    Generate the study and open column fixtures for the dataframe
     
     Inputs:
         df: pandas dataframe
         db: string
         core_columns: list of strings
     
-    Returns:
-        df: pandas dataframe
+    Yields:
+        fixture record dictionaries
     """
-    study_fixtures = ""
-    study_accessions = []
-
     last_pk_OpenColumns = get_last_pk("main_opencolumns", db)
-    df.fillna("", inplace=True)
-    for idx, row in df.iterrows():
-        if row["BioProject"] not in study_accessions:
-            study_accessions.append(row["BioProject"])
-            subset_df = df[df["BioProject"] == row["BioProject"]]
-            core_df = subset_df[core_columns]
-            study_info_dict = get_metainformation_dict(core_df)
-            study_fixture = write_study_fixture(study_info_dict)
-            
-            open_df = subset_df.drop(
-                [i for i in core_columns if i != 'BioProject']
-                 , axis=1)
-            open_df = open_df.dropna(axis=1, how="all")
-            bioproject = open_df["BioProject"].iloc[0]
-            open_fixtures = ""
-            for col in open_df.columns:
-                if col == "BioProject":
-                    continue
-                if last_pk_OpenColumns:
-                    last_pk_OpenColumns += 1
-                else:
-                    last_pk_OpenColumns = 1
-                values = open_df[col].dropna().astype(str).unique().tolist()
-                open_fixtures += write_OpenColumns_fixture(col, bioproject, values, last_pk_OpenColumns)
-
-        study_fixtures += study_fixture
-        study_fixtures += open_fixtures
-    return study_fixtures
-
-
-def fixtures_to_file(fixtures: str, output_file: str):
+    study_columns = set(get_column_names("main_study", db))
+
+    # get_metainformation_dict joins and string-compares these columns and
+    # assumes they are NaN free, so fill just them with the "nan" marker its
+    # checks expect instead of rewriting every missing cell in the frame;
+    # cast to string first because a categorical (ScientificName) rejects
+    # filling with a value outside its categories
+    for col in ["ScientificName", "SRAStudy", "LIBRARYTYPE", "Study_Pubmed_id", "AUTHOR"]:
+        if col in df.columns:
+            df[col] = df[col].astype("string").fillna("nan")
+
+    for bioproject, subset_df in df.groupby("BioProject", sort=False):
+        core_df = subset_df[core_columns]
+        study_info_dict = get_metainformation_dict(core_df)
+        yield write_study_fixture(study_info_dict, study_columns)
+
+        open_df = subset_df.drop(
+            [i for i in core_columns if i != 'BioProject']
+             , axis=1)
+        open_df = open_df.dropna(axis=1, how="all")
+        uniques = {col: open_df[col].dropna().astype(str).unique().tolist()
+                   for col in open_df.columns if col != "BioProject"}
+        for col, values in uniques.items():
+            if last_pk_OpenColumns:
+                last_pk_OpenColumns += 1
+            else:
+                last_pk_OpenColumns = 1
+            yield write_OpenColumns_fixture(col, bioproject, values, last_pk_OpenColumns)
+
+
+def fixtures_to_file(records, output_file: str):
     """
-    Write the fixture string to a file
+    Stream fixture records to a json file one record at a time, so peak
+    memory stays at a single record rather than the whole serialized set
     
     Inputs:
-        fixtures: string
+        records: iterable of fixture record dictionaries
         output_file: string
     """
     with open(output_file, "w") as f:
-        f.write(fixtures)
+        f.write("[\n")
+        first = True
+        for record in records:
+            if not first:
+                f.write(",\n")
+            f.write(json.dumps(record, indent=4, ensure_ascii=False))
+            first = False
+        f.write("\n]")
 
 
 def generate_open_column_sqlites(df: pd.DataFrame, sqlite_dir_path: str):
@@ -221,12 +264,21 @@ def generate_open_column_sqlites(df: pd.DataFrame, sqlite_dir_path: str):
     
     '''
 
-    grouped = df.groupby("BioProject")
+    grouped = df.groupby("BioProject", sort=False)
     for group, group_df in grouped:
         group_df = group_df.dropna(axis=1, how="all")
         conn = sqlite3.connect(f"{sqlite_dir_path}/{group}.sqlite")
 
-        group_df.to_sql(group, conn, if_exists="replace")
+        # these per-study databases are regenerated from scratch every run, so
+        # durability pragmas can be dropped and the whole table written as one
+        # transaction of batched multi-row inserts instead of autocommitted
+        # row-by-row INSERTs
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA journal_mode=MEMORY")
+        with conn:
+            group_df.to_sql(group, conn, if_exists="replace", index=False,
+                            method="multi", chunksize=500)
+        conn.close()
 
 def add_trips_booleans(df: pd.DataFrame, trips_df: pd.DataFrame) -> pd.DataFrame:
     '''
@@ -239,10 +291,7 @@ def add_trips_booleans(df: pd.DataFrame, trips_df: pd.DataFrame) -> pd.DataFrame
     Returns:
         df: pandas dataframe
     '''
-    df["trips_id"] = False
-    for idx, row in df.iterrows():
-        if row["Run"] in trips_df["Run"].tolist():
-            df.loc[idx, "trips_id"] = True
+    df["trips_id"] = df["Run"].isin(trips_df["Run"]).astype(bool)
     return df
 
 
@@ -257,10 +306,7 @@ def add_gwips_booleans(df: pd.DataFrame, gwips_df: pd.DataFrame) -> pd.DataFrame
     Returns:
         df: pandas dataframe
     '''
-    df["gwips_id"] = False
-    for idx, row in df.iterrows():
-        if row["BioProject"] in gwips_df["BioProject"].tolist():
-            df.loc[idx, "gwips_id"] = True
+    df["gwips_id"] = df["BioProject"].isin(gwips_df["BioProject"]).astype(bool)
     return df
 
 
@@ -275,10 +321,7 @@ def add_ribocrypt_booleans(df: pd.DataFrame, ribocrypt_df: pd.DataFrame) -> pd.D
     Returns:
         df: pandas dataframe
     '''
-    df["ribocrypt_id"] = False
-    for idx, row in df.iterrows():
-        if row["Run"] in ribocrypt_df["Run"].tolist():
-            df.loc[idx, "ribocrypt_id"] = True
+    df["ribocrypt_id"] = df["Run"].isin(ribocrypt_df["Run"]).astype(bool)
     return df
 
 
@@ -293,10 +336,7 @@ def add_readfile_booleans(df: pd.DataFrame, readfile_df: pd.DataFrame) -> pd.Dat
     Returns:
         df: pandas dataframe
     '''
-    df["readfile"] = False
-    for idx, row in df.iterrows():
-        if row["Run"] in readfile_df["Run"].tolist():
-            df.loc[idx, "readfile"] = True
+    df["readfile"] = df["Run"].isin(readfile_df["Run"]).astype(bool)
     return df
 
 
@@ -312,21 +352,12 @@ def clean_column_content(df: pd.DataFrame, clean_df: pd.DataFrame) -> pd.DataFra
         df: pandas dataframe
     '''
 
-    clean_name_dict = {}
-    clean_df = pd.read_csv(args.clean)
     for column, column_df in clean_df.groupby('Column'):
-        for idx, row in column_df.iterrows():
-            if column not in clean_name_dict:
-                clean_name_dict[column] = [(row['Main Name'], row["Clean Name"])]
-            else:
-                clean_name_dict[column].append((row['Main Name'], row["Clean Name"]))
-
-    for idx, row in df.iterrows():
-        for column in clean_name_dict:
-            if column in df.columns:
-                for main_name, clean_name in clean_name_dict[column]:
-                    if row[column] == main_name:
-                        df.loc[idx, column] = clean_name
+        if column in df.columns:
+            mapping = column_df.drop_duplicates('Main Name').set_index('Main Name')['Clean Name']
+            # only unmapped values keep their original; a value mapped to a
+            # blank Clean Name must come out as NaN rather than fall back
+            df[column] = df[column].map(mapping).where(df[column].isin(mapping.index), df[column])
     return df
 
 
@@ -341,16 +372,21 @@ def add_verification(df: pd.DataFrame, verified_df: pd.DataFrame) -> pd.DataFram
     Returns:
         df: pandas dataframe    
     '''
-    df["verified"] = False
-    for idx, row in df.iterrows():
-        if row["Run"] in verified_df["Run"].tolist():
-            df.loc[idx, "verified"] = True
+    df["verified"] = df["Run"].isin(verified_df["Run"]).astype(bool)
     return df
 
 
 def main(args):
 
-    df = pd.read_csv(args.input)
+    df = pd.read_csv(args.input, engine="pyarrow", dtype_backend="pyarrow")
+
+    # low-cardinality columns repeated across many samples: categorical
+    # storage keeps them as int codes, shrinking the frame and speeding up
+    # every downstream groupby, isin and comparison
+    for col in ("BioProject", "Platform", "LibraryStrategy", "LibrarySelection",
+                "LibrarySource", "LibraryLayout", "ScientificName", "Model"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
 
     df["Study_Pubmed_id"] = df["Study_Pubmed_id"].astype("Int64").astype(str)
     df['Study_Pubmed_id'] = df['Study_Pubmed_id'].replace("1", '')
@@ -358,46 +394,39 @@ def main(args):
 
     core_columns = ["BioProject", "Run","spots", "bases", "avgLength", "size_MB", "Experiment", "LibraryName", "LibraryStrategy", "LibrarySelection", "LibrarySource", "LibraryLayout", "InsertSize", "InsertDev", "Platform", "Model", "SRAStudy", "Study_Pubmed_id", "Sample", "BioSample", "SampleType", "TaxID", "ScientificName", "SampleName", "CenterName", "Submission", "MONTH", "YEAR", "AUTHOR", "sample_source", "sample_title", "LIBRARYTYPE", "REPLICATE", "CONDITION", "INHIBITOR", "TIMEPOINT", "TISSUE", "CELL_LINE", "FRACTION"]
 
-    core_columns = list(df.columns)
-
     last_pk_sample = get_last_pk("main_sample", args.db)
+    sample_columns = set(get_column_names("main_sample", args.db)) | {"BioProject"}
 
     if args.trips:
-        trips_df = pd.read_csv(args.trips)
+        trips_df = pd.read_csv(args.trips, engine="pyarrow", dtype_backend="pyarrow")
         df = add_trips_booleans(df, trips_df)
     
     if args.gwips:
-        gwips_df = pd.read_csv(args.gwips)
+        gwips_df = pd.read_csv(args.gwips, engine="pyarrow", dtype_backend="pyarrow")
         df = add_gwips_booleans(df, gwips_df)
 
     if args.ribocrypt:
-        ribocrypt_df = pd.read_csv(args.ribocrypt)
+        ribocrypt_df = pd.read_csv(args.ribocrypt, engine="pyarrow", dtype_backend="pyarrow")
         df = add_ribocrypt_booleans(df, ribocrypt_df)
 
     if args.readfile:
-        readfile_df = pd.read_csv(args.readfile, sep="\t")
+        readfile_df = pd.read_csv(args.readfile, sep="\t", engine="pyarrow", dtype_backend="pyarrow")
         df = add_readfile_booleans(df, readfile_df)
 
     if args.clean:
-        df = clean_column_content(df, args.clean)
+        clean_df = pd.read_csv(args.clean, engine="pyarrow", dtype_backend="pyarrow")
+        df = clean_column_content(df, clean_df)
 
     if args.verified:
-        verified_df = pd.read_csv(args.verified)
+        verified_df = pd.read_csv(args.verified, engine="pyarrow", dtype_backend="pyarrow")
         df = add_verification(df, verified_df)
 
 
-    print("generating sample fixtures")
-    print("generating study fixtures")
-    fixtures = "[\n"
-    fixtures += add_study_fixtures(df, args.db, core_columns)
-    fixtures += df_to_sample_fixture(df, last_pk_sample)
-
+    print("generating fixtures and writing to file")
+    records = chain(add_study_fixtures(df, args.db, core_columns),
+                    df_to_sample_fixture(df, last_pk_sample, sample_columns))
+    fixtures_to_file(records, args.output)
     print("Done!")
-
-    fixtures = fixtures[:-2]
-    fixtures += "\n]"
-    print("writing fixtures to file")
-    fixtures_to_file(fixtures, args.output)
     open_df = df.drop(
         [i for i in core_columns if i not in ['Run', 'BioProject']]
             , axis=1)
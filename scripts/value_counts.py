@@ -0,0 +1,52 @@
+'''
+This script reports value counts for the controlled vocabulary columns of the
+run level metadata, to check how well the cleaning collapsed the free text
+
+Writes the full count table and the top 3 values per column
+
+Usage:
+    python value_counts.py -i <metadata csv> -o <output file>
+'''
+
+import argparse
+import pandas as pd
+
+COLUMNS_TO_ANALYZE = ["LIBRARYTYPE", "INHIBITOR", "CELL_LINE", "TISSUE", "CONDITION"]
+
+
+def analyze_column_counts(file_path: str, output_file: str):
+    '''
+    Write the value counts for each vocabulary column to a tsv report
+
+    Inputs:
+        file_path: string
+        output_file: string
+
+    Returns:
+        None
+    '''
+    df = pd.read_csv(file_path, usecols=COLUMNS_TO_ANALYZE, dtype="category", engine="pyarrow")
+
+    with open(output_file, "w") as f:
+        for col in COLUMNS_TO_ANALYZE:
+            # counting a categorical runs over the integer codes, and to_csv
+            # formats the table at C level rather than row by row in Python
+            vc = df[col].value_counts()
+            f.write(f"# {col}\n")
+            vc.to_csv(f, sep="\t", header=["count"])
+            f.write(f"# {col} top 3\n")
+            vc.head(3).to_csv(f, sep="\t", header=["count"])
+            f.write("\n")
+
+
+def main(args):
+    analyze_column_counts(args.input_file, args.output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report value counts for the vocabulary columns")
+    parser.add_argument("-i", "--input_file", help="Input metadata csv file", required=True)
+    parser.add_argument("-o", "--output_file", help="Output report file", required=True)
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,138 @@
+'''
+Tests for the metadata cleaning script
+
+Run with:
+    python -m unittest discover tests
+'''
+
+import io
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from clean_metadata import clean_cell_lines, clean_library_types, update_from_ribocrypt
+
+
+def make_arrow_frame(data):
+    '''
+    Build a dataframe with arrow-backed string columns, matching how the
+    script reads its csv inputs
+
+    Inputs:
+        data: dictionary of column name to list of values
+
+    Returns:
+        df: pandas dataframe
+    '''
+    return pd.DataFrame({col: pd.array(values, dtype="string[pyarrow]")
+                         for col, values in data.items()})
+
+
+class TestUpdateFromRibocrypt(unittest.TestCase):
+
+    def test_uncurated_runs_are_left_alone(self):
+        df = make_arrow_frame({
+            "Run": ["SRR1", "SRR2", "SRR3"],
+            "CELL_LINE": ["HeLa", "HEK293", None],
+            "TISSUE": [None, None, None],
+            "INHIBITOR": ["chx", None, "chx"],
+            "AUTHOR": ["Smith", None, None],
+            "CONDITION": [None, "old", None],
+        })
+        # SRR2 and SRR3 are absent from the curated file
+        ribocrypt_df = make_arrow_frame({
+            "Run": ["SRR1"],
+            "CELL_LINE": ["K562"],
+            "TISSUE": ["kidney"],
+            "INHIBITOR": ["NONE"],
+            "AUTHOR": ["nan"],
+            "CONDITION": ["WT"],
+        })
+
+        df = update_from_ribocrypt(df, ribocrypt_df)
+
+        # curated values applied, NONE/nan placeholders ignored
+        self.assertEqual(df.loc[0, "CELL_LINE"], "K562")
+        self.assertEqual(df.loc[0, "TISSUE"], "kidney")
+        self.assertEqual(df.loc[0, "INHIBITOR"], "chx")
+        self.assertEqual(df.loc[0, "AUTHOR"], "Smith")
+        self.assertEqual(df.loc[0, "CONDITION"], "Control")
+
+        # uncurated runs untouched
+        self.assertEqual(df.loc[1, "CELL_LINE"], "HEK293")
+        self.assertEqual(df.loc[1, "CONDITION"], "old")
+        self.assertTrue(pd.isna(df.loc[2, "CELL_LINE"]))
+        self.assertEqual(df.loc[2, "INHIBITOR"], "chx")
+
+    def test_condition_maps_wt_to_control_and_rest_to_test(self):
+        df = make_arrow_frame({
+            "Run": ["SRR1", "SRR2"],
+            "CELL_LINE": [None, None],
+            "TISSUE": [None, None],
+            "INHIBITOR": [None, None],
+            "AUTHOR": [None, None],
+            "CONDITION": [None, None],
+        })
+        ribocrypt_df = make_arrow_frame({
+            "Run": ["SRR1", "SRR2"],
+            "CELL_LINE": ["NONE", "NONE"],
+            "TISSUE": ["NONE", "NONE"],
+            "INHIBITOR": ["NONE", "NONE"],
+            "AUTHOR": ["NONE", "NONE"],
+            "CONDITION": ["WT", "knockout"],
+        })
+
+        df = update_from_ribocrypt(df, ribocrypt_df)
+
+        self.assertEqual(df.loc[0, "CONDITION"], "Control")
+        self.assertEqual(df.loc[1, "CONDITION"], "Test")
+
+
+class TestCleaners(unittest.TestCase):
+
+    @staticmethod
+    def read_arrow_csv(csv):
+        '''
+        Parse a csv string the same way the script reads its input, so the
+        cleaners see arrow-backed categoricals
+
+        Inputs:
+            csv: string
+
+        Returns:
+            df: pandas dataframe
+        '''
+        df = pd.read_csv(io.StringIO(csv), dtype_backend="pyarrow")
+        for col in df.columns:
+            df[col] = df[col].astype("category")
+        return df
+
+    def test_library_types_keep_their_own_label_on_arrow_frames(self):
+        # on arrow-backed columns str.extract fills the non-matching groups
+        # of a matching row with "" rather than NA; every row here matches,
+        # so a mask that only checks notna would label them all RFP
+        df = self.read_arrow_csv(
+            "LIBRARYTYPE\nRNA-Seq\ninitiation\nribosome profiling\n40S\n80S\nother\n")
+
+        df = clean_library_types(df)
+
+        self.assertEqual(df["LIBRARYTYPE"].tolist(),
+                         ["RNA", "TI", "RFP", "SSU", "LSU", "other"])
+
+    def test_cell_lines_keep_their_own_label_on_arrow_frames(self):
+        df = self.read_arrow_csv(
+            "CELL_LINE\nneuroblastoma\nprimary fibroblast\nHeLa\nliver\n")
+
+        df = clean_cell_lines(df)
+
+        self.assertEqual(df["CELL_LINE"].tolist()[:3],
+                         ["Neuroblast", "Fibroblast", "HeLa"])
+        self.assertTrue(pd.isna(df.loc[3, "CELL_LINE"]))
+
+
+if __name__ == "__main__":
+    unittest.main()